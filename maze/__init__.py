@@ -1,3 +1,3 @@
-from .solver import analyze
+from .solver import analyze, Analyzer
 
-__all__ = ['analyze']
+__all__ = ['analyze', 'Analyzer']
@@ -0,0 +1,389 @@
+#cython: language_level=3, boundscheck=False, wraparound=False, initializedcheck=False, cdivision=True
+"""
+Connected components of open cells, for instant reachability answers.
+"""
+import numpy
+cimport numpy
+from cpython.mem cimport PyMem_Realloc, PyMem_Free
+
+
+# State of a cell, as far as reachability is concerned
+cdef enum:
+    WALL = 0
+    OPEN = 1
+    CASTLE = 2
+
+# Searches started around a new wall, one from each open neighbour
+DEF SEARCHES = 4
+
+
+cdef inline numpy.int8_t state(numpy.int8_t kind):
+    if kind < 0:
+        return WALL
+    if kind == 1:
+        return CASTLE
+    return OPEN
+
+
+cdef struct queue:
+    Py_ssize_t * items
+    Py_ssize_t size
+    Py_ssize_t head
+    Py_ssize_t tail
+
+
+cdef int enqueue(queue * q, Py_ssize_t i) except -1:
+    cdef Py_ssize_t * items
+    if q.tail >= q.size:
+        items = <Py_ssize_t *>PyMem_Realloc(
+            q.items, max(2 * q.size, 64) * sizeof(Py_ssize_t))
+        if items == NULL:
+            raise MemoryError()
+        q.items = items
+        q.size = max(2 * q.size, 64)
+    q.items[q.tail] = i
+    q.tail += 1
+    return 0
+
+
+cdef inline Py_ssize_t find_group(int * groups, int s):
+    while groups[s] != s:
+        s = groups[s]
+    return s
+
+
+cdef class Components:
+    """Union-find of open cells, with castles counted in every component
+
+    Answers whether a cell is connected to a castle, and whether all the
+    cells are, in constant time. Call update with the changed cells after
+    the maze is modified. Opened cells are merged into their neighbours'
+    components. Around a new wall, searches from its open neighbours run
+    in lockstep until they meet again; only pieces that came apart are
+    labelled again, and the search stops as soon as that's known.
+
+    Union-find elements are not cells: a cell that gets walled off or
+    labelled again gets a new element, and the old one stays in the forest
+    for the cells that still point through it. The elements are compacted
+    once there are too many of them.
+    """
+    cdef numpy.int8_t[:, :] maze
+    cdef readonly Py_ssize_t rows, columns
+    # state of every cell when last seen
+    cdef numpy.int8_t[:] states
+    # element of every cell, -1 for walls
+    cdef numpy.int64_t[:] element
+    # parent in the union-find forest of elements
+    cdef numpy.int64_t[:] parent
+    # number of cells and castles, valid for roots only
+    cdef numpy.int64_t[:] sizes
+    cdef numpy.int64_t[:] castles
+    # elements in use, and how many may be before compacting
+    cdef Py_ssize_t count, limit
+    # marks of cells visited by the searches, and the last mark used
+    cdef numpy.int32_t[:] marks
+    cdef numpy.int32_t mark
+    # open cells in components with no castle
+    cdef readonly Py_ssize_t unreached
+    cdef queue queues[SEARCHES]
+
+    def __cinit__(self):
+        cdef int s
+        for s in range(SEARCHES):
+            self.queues[s].items = NULL
+            self.queues[s].size = 0
+
+    def __dealloc__(self):
+        cdef int s
+        for s in range(SEARCHES):
+            PyMem_Free(self.queues[s].items)
+
+    def __init__(self, numpy.ndarray[numpy.int8_t, ndim=2] maze):
+        cdef Py_ssize_t i, n
+        self.maze = maze
+        self.rows, self.columns = maze.shape[0], maze.shape[1]
+        n = self.rows * self.columns
+        self.states = numpy.empty(n, dtype=numpy.int8)
+        self.element = numpy.empty(n, dtype=numpy.int64)
+        self.parent = numpy.empty(n, dtype=numpy.int64)
+        self.sizes = numpy.empty(n, dtype=numpy.int64)
+        self.castles = numpy.empty(n, dtype=numpy.int64)
+        self.limit = 2 * n + 64
+        self.marks = numpy.zeros(n, dtype=numpy.int32)
+        self.mark = 0
+        for i in range(n):
+            self.states[i] = state(maze[i // self.columns, i % self.columns])
+        self.rebuild()
+
+    cdef int rebuild(self) except -1:
+        """Make all the components again, from the states of the cells"""
+        cdef Py_ssize_t r, c, i
+        self.count = 0
+        self.unreached = 0
+        for r in range(self.rows):
+            for c in range(self.columns):
+                i = r * self.columns + c
+                self.element[i] = -1
+                if self.states[i] != WALL:
+                    self.add(i)
+                    if c > 0 and self.states[i - 1] != WALL:
+                        self.union(self.element[i], self.element[i - 1])
+                    if r > 0 and self.states[i - self.columns] != WALL:
+                        self.union(self.element[i],
+                                   self.element[i - self.columns])
+        return 0
+
+    cdef inline Py_ssize_t unreached_in(self, Py_ssize_t root):
+        return self.sizes[root] if self.castles[root] == 0 else 0
+
+    cdef Py_ssize_t find(self, Py_ssize_t e):
+        while self.parent[e] != e:
+            # path halving
+            self.parent[e] = self.parent[self.parent[e]]
+            e = self.parent[e]
+        return e
+
+    cdef Py_ssize_t new_element(self, Py_ssize_t size,
+                                Py_ssize_t castles) except -1:
+        """Return a new root element of the given size and castles"""
+        cdef Py_ssize_t e = self.count
+        cdef Py_ssize_t capacity = self.parent.shape[0]
+        if e == capacity:
+            capacity = min(max(2 * capacity, 64), self.limit)
+            self.parent = numpy.resize(self.parent, capacity)
+            self.sizes = numpy.resize(self.sizes, capacity)
+            self.castles = numpy.resize(self.castles, capacity)
+        self.count += 1
+        self.parent[e] = e
+        self.sizes[e] = size
+        self.castles[e] = castles
+        return e
+
+    cdef int add(self, Py_ssize_t i) except -1:
+        """Make a new component of the open cell i"""
+        cdef Py_ssize_t e = self.new_element(1, self.states[i] == CASTLE)
+        self.element[i] = e
+        self.unreached += self.unreached_in(e)
+        return 0
+
+    cdef void union(self, Py_ssize_t a, Py_ssize_t b):
+        a = self.find(a)
+        b = self.find(b)
+        if a == b:
+            return
+        if self.sizes[a] < self.sizes[b]:
+            a, b = b, a
+        self.unreached -= self.unreached_in(a) + self.unreached_in(b)
+        self.parent[b] = a
+        self.sizes[a] += self.sizes[b]
+        self.castles[a] += self.castles[b]
+        self.unreached += self.unreached_in(a)
+
+    cdef int neighbours(self, Py_ssize_t i, Py_ssize_t * out):
+        """Store open neighbours of cell i in out, return how many"""
+        cdef int k = 0
+        cdef Py_ssize_t r = i // self.columns, c = i % self.columns
+        if r > 0 and self.states[i - self.columns] != WALL:
+            out[k] = i - self.columns
+            k += 1
+        if r < self.rows - 1 and self.states[i + self.columns] != WALL:
+            out[k] = i + self.columns
+            k += 1
+        if c > 0 and self.states[i - 1] != WALL:
+            out[k] = i - 1
+            k += 1
+        if c < self.columns - 1 and self.states[i + 1] != WALL:
+            out[k] = i + 1
+            k += 1
+        return k
+
+    cdef int open_cell(self, Py_ssize_t i, numpy.int8_t new) except -1:
+        cdef Py_ssize_t around[4]
+        cdef int k, n
+        self.states[i] = new
+        self.add(i)
+        n = self.neighbours(i, around)
+        for k in range(n):
+            self.union(self.element[i], self.element[around[k]])
+        return 0
+
+    cdef int wall_cell(self, Py_ssize_t i) except -1:
+        cdef Py_ssize_t around[4]
+        cdef Py_ssize_t root = self.find(self.element[i])
+        self.unreached -= self.unreached_in(root)
+        self.sizes[root] -= 1
+        self.castles[root] -= self.states[i] == CASTLE
+        self.unreached += self.unreached_in(root)
+        self.states[i] = WALL
+        self.element[i] = -1
+        cdef int n = self.neighbours(i, around)
+        if n > 1:
+            self.split(root, around, n)
+        return 0
+
+    cdef int split(self, Py_ssize_t root, Py_ssize_t * seeds,
+                   int n) except -1:
+        """Label again pieces of root that came apart around seeds
+
+        A search runs from every seed, one cell each in turn. Searches that
+        meet are grouped. A group whose searches all ran out has found its
+        whole piece; once at most one group is still running, the rest of
+        root is known to be connected, and keeps the root.
+        """
+        cdef int groups[SEARCHES]
+        cdef Py_ssize_t around[4]
+        cdef queue * q
+        cdef Py_ssize_t i, j, e, size, castles, largest
+        cdef numpy.int32_t base
+        cdef int s, t, a, b, k, m, running, left, keep
+        cdef bint done[SEARCHES]
+
+        if self.mark > 2**31 - 2 * SEARCHES:
+            self.marks[:] = 0
+            self.mark = 0
+        base = self.mark + 1
+        self.mark += SEARCHES
+        for s in range(n):
+            groups[s] = s
+            q = &self.queues[s]
+            q.head = q.tail = 0
+            self.marks[seeds[s]] = base + s
+            enqueue(q, seeds[s])
+
+        while True:
+            for s in range(n):
+                q = &self.queues[s]
+                if q.head == q.tail:
+                    continue
+                i = q.items[q.head]
+                q.head += 1
+                m = self.neighbours(i, around)
+                for k in range(m):
+                    j = around[k]
+                    t = self.marks[j] - base
+                    if 0 <= t < n:
+                        a, b = find_group(groups, s), find_group(groups, t)
+                        if a != b:
+                            groups[b] = a
+                    else:
+                        self.marks[j] = base + s
+                        enqueue(q, j)
+            # groups left, and those of them still searching
+            left = running = 0
+            for s in range(n):
+                if find_group(groups, s) != s:
+                    continue
+                left += 1
+                done[s] = True
+                for t in range(n):
+                    if (find_group(groups, t) == s and
+                            self.queues[t].head < self.queues[t].tail):
+                        done[s] = False
+                running += not done[s]
+            if left == 1:
+                # everything met again, nothing came apart
+                return 0
+            if running <= 1:
+                break
+
+        # the group still searching keeps the root, or the largest one
+        keep = -1
+        largest = -1
+        for s in range(n):
+            if find_group(groups, s) != s:
+                continue
+            if not done[s]:
+                keep = s
+                break
+            size = 0
+            for t in range(n):
+                if find_group(groups, t) == s:
+                    size += self.queues[t].tail
+            if size > largest:
+                keep, largest = s, size
+
+        self.unreached -= self.unreached_in(root)
+        for s in range(n):
+            if find_group(groups, s) != s or s == keep:
+                continue
+            e = self.new_element(0, 0)
+            size = castles = 0
+            for t in range(n):
+                if find_group(groups, t) != s:
+                    continue
+                q = &self.queues[t]
+                for k in range(q.tail):
+                    i = q.items[k]
+                    self.element[i] = e
+                    castles += self.states[i] == CASTLE
+                size += q.tail
+            self.sizes[e] = size
+            self.castles[e] = castles
+            self.sizes[root] -= size
+            self.castles[root] -= castles
+            self.unreached += self.unreached_in(e)
+        self.unreached += self.unreached_in(root)
+        return 0
+
+    def update(self, changed):
+        """Update the components after the given cells of the maze changed
+
+        Args:
+            changed: An iterable with (row, column) pairs
+
+        Raises:
+            IndexError: If a cell is out of the maze, nothing is updated then
+        """
+        cdef Py_ssize_t r, c, i, root
+        cdef numpy.int8_t old, new
+        changed = list(changed)
+        for r, c in changed:
+            if not (0 <= r < self.rows and 0 <= c < self.columns):
+                raise IndexError('Location is out of the maze')
+        for r, c in changed:
+            i = r * self.columns + c
+            old, new = self.states[i], state(self.maze[r, c])
+            if old == new:
+                continue
+            # a cell takes at most SEARCHES - 1 new elements
+            if self.count + SEARCHES > self.limit:
+                self.rebuild()
+            if old == WALL:
+                self.open_cell(i, new)
+            elif new == WALL:
+                self.wall_cell(i)
+            else:
+                # castle added or removed
+                root = self.find(self.element[i])
+                self.unreached -= self.unreached_in(root)
+                self.castles[root] += 1 if new == CASTLE else -1
+                self.unreached += self.unreached_in(root)
+                self.states[i] = new
+
+    def is_connected(self, Py_ssize_t row, Py_ssize_t column):
+        """Is the cell connected to any castle?
+
+        Walls are not connected to anything.
+        """
+        if not (0 <= row < self.rows and 0 <= column < self.columns):
+            raise IndexError('Location is out of the maze')
+        cdef Py_ssize_t i = row * self.columns + column
+        if self.states[i] == WALL:
+            return False
+        return self.castles[self.find(self.element[i])] > 0
+
+    @property
+    def is_reachable(self):
+        """Is every open cell connected to a castle?"""
+        return self.unreached == 0
+
+    @property
+    def labels(self):
+        """Array with component label of every cell, -1 for walls"""
+        cdef Py_ssize_t i
+        cdef numpy.ndarray[numpy.int64_t, ndim=1] labels = numpy.empty(
+            self.rows * self.columns, dtype=numpy.int64)
+        for i in range(self.rows * self.columns):
+            labels[i] = (-1 if self.states[i] == WALL
+                         else self.find(self.element[i]))
+        return labels.reshape(self.rows, self.columns)
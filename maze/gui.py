@@ -33,7 +33,9 @@ from docutils.core import publish_parts
 from PyQt5 import QtCore, QtGui, QtWidgets, QtSvg, uic
 from bresenham import bresenham
 
+from . import components
 from . import generator
+from . import history
 from . import solver
 from . import liner
 
@@ -42,6 +44,8 @@ CELL_SIZE_MAX = 128
 CELL_SIZE_MIN = 8
 ROWS = 31
 COLUMNS = 47
+# With more changed rectangles than this, the whole widget is repainted
+DIRTY_RECTS_MAX = 256
 
 KIND_ROLE = QtCore.Qt.UserRole
 
@@ -53,6 +57,15 @@ def get_filename(name):
     return os.path.join(os.path.dirname(__file__), name)
 
 
+def line_cells(lines, shape):
+    """Return sorted flat indices of all the cells on the lines"""
+    if not lines:
+        return numpy.empty(0, dtype=numpy.intp)
+    cells = numpy.concatenate([numpy.asarray(line).reshape(-1, 2)
+                               for line in lines])
+    return numpy.unique(numpy.ravel_multi_index(cells.T, shape))
+
+
 def get_line_pic(i):
     if 0 < i < 16:
         return QtSvg.QSvgRenderer(get_filename('pics/lines/{}.svg'.format(i)))
@@ -74,9 +87,19 @@ SVG_ARROWS = {
 
 
 class GridWidget(QtWidgets.QWidget):
+    history_changed = QtCore.pyqtSignal()
+    reachability_changed = QtCore.pyqtSignal(bool)
+
     def __init__(self, array):
         super().__init__()
         self.lines = None
+        self.line_cells = None
+        self.amaze = None
+        self.components = None
+        self.history = history.History()
+        # stroke maps flat indices of cells changed since the mouse button
+        # was pressed to their original values
+        self.stroke = {}
         self._cell_size = CELL_SIZE
         self.array = array
         self.selected_tile_kind = 0
@@ -94,6 +117,11 @@ class GridWidget(QtWidgets.QWidget):
     @array.setter
     def array(self, val):
         self._array = val
+        self.amaze = None
+        self.components = None
+        self.stroke = {}
+        self.history.clear()
+        self.history_changed.emit()
         self._resize()
 
     @property
@@ -111,13 +139,61 @@ class GridWidget(QtWidgets.QWidget):
         self.resize(*size)
         self._update()
 
-    def _update(self):
-        amaze = solver.analyze(self.array)
+    def _update(self, changed=None):
+        """Analyze the maze again
+
+        If changed cells are given, only the previous analysis is updated,
+        and only the cells that look different are repainted.
+        """
+        full = self.amaze is None or changed is None
+        if full:
+            self.amaze = solver.analyze(self.array)
+            self.components = components.Components(self.array)
+        else:
+            # directions are updated in place, keep the painted arrows
+            old_lines = self.lines
+            old_cells = self.line_cells
+            old_arrows = self.directions.flat[old_cells]
+            self.amaze.update(changed)
+            self.components.update(changed)
+        self.reachability_changed.emit(self.components.is_reachable)
+        amaze = self.amaze
         self.directions = amaze.directions
-        self.update()
         self.lines = liner.add_lines(amaze.lines, shape=self.array.shape)
+        self.line_cells = line_cells(amaze.lines, self.array.shape)
+        if full:
+            self.update()
+        else:
+            # only cells on the old or new lines may have changed lines
+            # or arrows, besides the changed tiles themselves
+            cells = numpy.union1d(old_cells, self.line_cells)
+            changed = numpy.asarray(changed).reshape(-1, 2)
+            self._update_cells(numpy.unique(numpy.concatenate([
+                cells[old_lines.flat[cells] != self.lines.flat[cells]],
+                old_cells[self.directions.flat[old_cells] != old_arrows],
+                numpy.ravel_multi_index(changed.T, self.array.shape),
+            ])))
         return amaze
 
+    def _update_cells(self, indices):
+        """Schedule repaint of cells given by sorted flat indices"""
+        if not len(indices):
+            return
+        rows, columns = numpy.divmod(indices, self.array.shape[1])
+        # neighbouring cells in a row are repainted as one rectangle
+        breaks = numpy.flatnonzero((numpy.diff(indices) != 1) |
+                                   (numpy.diff(rows) != 0)) + 1
+        starts = numpy.concatenate([[0], breaks])
+        ends = numpy.concatenate([breaks, [len(indices)]])
+        if len(starts) > DIRTY_RECTS_MAX:
+            self.update()
+            return
+        for start, end in zip(starts, ends):
+            x, y = self.matrix_to_widget_coords(int(rows[start]),
+                                                int(columns[start]))
+            self.update(QtCore.QRect(x, y, int(end - start) * self.cell_size,
+                                     self.cell_size))
+
     def widget_to_matrix_coords(self, x, y):
         """Given pixel ccordinates, return coordinates of corresponding cell
 
@@ -133,7 +209,13 @@ class GridWidget(QtWidgets.QWidget):
         return column * self.cell_size, row * self.cell_size
 
     def paintEvent(self, event):
-        rect = event.rect()
+        painter = QtGui.QPainter(self)
+        # the region may be a few small rectangles far apart,
+        # don't paint everything in between
+        for rect in event.region().rects():
+            self._paint_rect(painter, rect)
+
+    def _paint_rect(self, painter, rect):
         row_min, col_min = self.widget_to_matrix_coords(rect.left(),
                                                         rect.top())
         row_min = max(row_min, 0)
@@ -142,7 +224,6 @@ class GridWidget(QtWidgets.QWidget):
                                                         rect.bottom())
         row_max = min(row_max + 1, self.array.shape[0])
         col_max = min(col_max + 1, self.array.shape[1])
-        painter = QtGui.QPainter(self)
         for row in range(row_min, row_max):
             for column in range(col_min, col_max):
                 kind = self.array[row, column]
@@ -184,6 +265,7 @@ class GridWidget(QtWidgets.QWidget):
         if event.button() & self.drag_button:
             self.drag_to(event.x(), event.y(), self.drag_button)
             self.drag_start = None
+            self._end_stroke()
 
     def drag_to(self, end_x, end_y, button):
         end_row, end_column = self.widget_to_matrix_coords(end_x, end_y)
@@ -194,17 +276,44 @@ class GridWidget(QtWidgets.QWidget):
             else:
                 kind = self.selected_tile_kind
             array = self.array
-            changed = False
+            changed = []
             for row, column in bresenham(start_row, start_column,
                                          end_row, end_column):
                 if 0 <= column < array.shape[1] and 0 <= row < array.shape[0]:
                     if array[row, column] != kind:
+                        index = row * array.shape[1] + column
+                        self.stroke.setdefault(index, array[row, column])
                         array[row, column] = kind
-                        changed = True
+                        changed.append((row, column))
             if changed:
-                self._update()
+                self._update(changed)
         self.drag_start = end_row, end_column
 
+    def _end_stroke(self):
+        stroke, self.stroke = self.stroke, {}
+        if not stroke:
+            return
+        indices = numpy.fromiter(stroke, dtype=numpy.intp, count=len(stroke))
+        self.history.record(indices, list(stroke.values()),
+                            self.array.flat[indices])
+        self.history_changed.emit()
+
+    def undo(self):
+        # a stroke in progress is a change of its own, the drag goes on
+        # with a new one
+        self._end_stroke()
+        changed = self.history.undo(self.array)
+        if changed is not None:
+            self._update(changed)
+            self.history_changed.emit()
+
+    def redo(self):
+        self._end_stroke()
+        changed = self.history.redo(self.array)
+        if changed is not None:
+            self._update(changed)
+            self.history_changed.emit()
+
 
 class Gui(object):
     def __init__(self):
@@ -230,6 +339,9 @@ class Gui(object):
         self.scroll_area = self.win.findChild(QtWidgets.QScrollArea, 'scrollArea')
         self.grid = grid = GridWidget(self.array)
         self.scroll_area.setWidget(grid)
+        grid.history_changed.connect(self._update_history_actions)
+        grid.reachability_changed.connect(self._show_reachability)
+        self._show_reachability(grid.components.is_reachable)
 
         self.palette = palette = self.win.findChild(QtWidgets.QListWidget, 'palette')
         self._add_item('grass', 'Grass', 0, SVG_GRASS)
@@ -248,6 +360,8 @@ class Gui(object):
         self._action('actionOpen').triggered.connect(self._open)
         self._action('actionSave').triggered.connect(self._save)
         self._action('actionSave_As').triggered.connect(self._save_as)
+        self._action('actionUndo').triggered.connect(grid.undo)
+        self._action('actionRedo').triggered.connect(grid.redo)
         self._action('actionAbout').triggered.connect(self._about)
 
     def _action(self, name):
@@ -330,6 +444,17 @@ class Gui(object):
         self.filename = 'untitled.csv.gz'
         self._update_title()
 
+    def _update_history_actions(self):
+        self._action('actionUndo').setEnabled(self.grid.history.can_undo)
+        self._action('actionRedo').setEnabled(self.grid.history.can_redo)
+
+    def _show_reachability(self, reachable):
+        if reachable:
+            message = 'All cells can reach a castle'
+        else:
+            message = 'Some cells cannot reach any castle'
+        self.win.statusBar().showMessage(message)
+
     def _update_title(self):
         self.win.setWindowTitle('Maze [{}]'.format(self.filename))
 
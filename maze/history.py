@@ -0,0 +1,101 @@
+import collections
+
+import numpy
+
+# Default memory limit for the undo history, in bytes
+LIMIT = 64 * 2**20
+
+
+class Change:
+    """Cells changed at once, e.g. by one stroke of the mouse
+
+    Keeps flat indices of the cells, and their old and new values.
+    """
+    __slots__ = ('indices', 'old', 'new')
+
+    def __init__(self, indices, old, new):
+        self.indices = numpy.asarray(indices, dtype=numpy.intp)
+        self.old = numpy.asarray(old, dtype=numpy.int8)
+        self.new = numpy.asarray(new, dtype=numpy.int8)
+        if not len(self.indices) == len(self.old) == len(self.new):
+            raise ValueError('Indices, old and new values must match')
+
+    @property
+    def nbytes(self):
+        return self.indices.nbytes + self.old.nbytes + self.new.nbytes
+
+
+class History:
+    """Undo/redo history of changes to an array
+
+    Only the changed cells are stored, not copies of the array.
+    When the stored changes take more than limit bytes,
+    the oldest ones are forgotten.
+    """
+    def __init__(self, limit=LIMIT):
+        self.limit = limit
+        self._undo = collections.deque()
+        self._redo = []
+        self.nbytes = 0
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self.nbytes = 0
+
+    def record(self, indices, old, new):
+        """Record a change, forget everything that could be redone
+
+        Args:
+            indices: Flat indices of the changed cells
+            old: Values before the change
+            new: Values after the change
+        """
+        change = Change(indices, old, new)
+        if not len(change.indices):
+            return
+        for redone in self._redo:
+            self.nbytes -= redone.nbytes
+        self._redo.clear()
+        self._undo.append(change)
+        self.nbytes += change.nbytes
+        while self.nbytes > self.limit and self._undo:
+            self.nbytes -= self._undo.popleft().nbytes
+
+    def undo(self, array):
+        """Revert the last change in array
+
+        Returns:
+            ndarray: Coordinates of the changed cells as (n, 2) array,
+            or None if there is nothing to undo
+        """
+        if not self._undo:
+            return None
+        change = self._undo.pop()
+        self._redo.append(change)
+        return self._apply(array, change.indices, change.old)
+
+    def redo(self, array):
+        """Apply the last undone change to array again
+
+        Returns:
+            ndarray: Coordinates of the changed cells as (n, 2) array,
+            or None if there is nothing to redo
+        """
+        if not self._redo:
+            return None
+        change = self._redo.pop()
+        self._undo.append(change)
+        return self._apply(array, change.indices, change.new)
+
+    def _apply(self, array, indices, values):
+        array.flat[indices] = values
+        return numpy.column_stack(numpy.unravel_index(indices, array.shape))
@@ -0,0 +1,153 @@
+"""
+Load generator for the path query server.
+
+Loads a generated maze into a running server, then keeps a number of
+connections busy with path queries for random reachable cells, and reports
+queries per second and latency percentiles.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+import numpy
+
+from . import generator
+from . import solver
+from .server import HOST, LINE_LIMIT, PORT
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._ids = itertools.count()
+        self._waiting = {}
+        self._receiver = asyncio.ensure_future(self._receive())
+
+    @classmethod
+    async def connect(cls, *, host=HOST, port=PORT, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(
+                path, limit=LINE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(
+                host, port, limit=LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def request(self, **request):
+        """Send a request, return the response"""
+        request['id'] = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request['id']] = future
+        self.writer.write(json.dumps(request).encode() + b'\n')
+        await self.writer.drain()
+        return await future
+
+    async def _receive(self):
+        error = ConnectionError('Connection closed')
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self._waiting.pop(response.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except (ValueError, ConnectionError) as e:
+            error = e
+        for future in self._waiting.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def close(self):
+        self._receiver.cancel()
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    idx = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[idx]
+
+
+async def run(*, host=HOST, port=PORT, path=None, rows=201, columns=201,
+              connections=8, depth=16, duration=5.0, name='loadgen'):
+    """Run the benchmark, return a dict with the results"""
+    array = generator.maze(rows, columns)
+    directions = solver.analyze(array).directions
+    reachable = (directions != b'#') & (directions != b' ')
+    cells = [tuple(c) for c in numpy.argwhere(reachable).tolist()]
+
+    clients = [await Client.connect(host=host, port=port, path=path)
+               for i in range(connections)]
+    response = await clients[0].request(op='load', maze=name,
+                                        array=array.tolist())
+    if 'error' in response:
+        raise RuntimeError(response['error'])
+
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(client):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.request(op='path', maze=name,
+                                            cell=random.choice(cells))
+            latencies.append(time.perf_counter() - start)
+            if 'error' in response:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(client)
+                           for client in clients
+                           for i in range(depth)))
+    elapsed = time.perf_counter() - start
+
+    await clients[0].request(op='drop', maze=name)
+    for client in clients:
+        await client.close()
+
+    latencies.sort()
+    return {
+        'queries': len(latencies),
+        'errors': errors,
+        'qps': len(latencies) / elapsed,
+        'p50': percentile(latencies, .5),
+        'p99': percentile(latencies, .99),
+        'p999': percentile(latencies, .999),
+        'max': latencies[-1] if latencies else float('nan'),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the maze server')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--unix', metavar='PATH')
+    parser.add_argument('--rows', type=int, default=201)
+    parser.add_argument('--columns', type=int, default=201)
+    parser.add_argument('--connections', type=int, default=8)
+    parser.add_argument('--depth', type=int, default=16,
+                        help='outstanding queries per connection')
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args(argv)
+    results = asyncio.run(run(host=args.host, port=args.port, path=args.unix,
+                              rows=args.rows, columns=args.columns,
+                              connections=args.connections, depth=args.depth,
+                              duration=args.duration))
+    print('{queries} queries, {errors} errors, {qps:.0f} queries/s'.format(
+        **results))
+    for key in 'p50', 'p99', 'p999', 'max':
+        print('{}: {:.3f} ms'.format(key, results[key] * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+Path query server.
+
+Keeps analyzed mazes loaded and answers "route from this cell to the castle"
+queries over newline-delimited JSON, on a Unix socket or on TCP localhost.
+
+Every request is one JSON object on one line, every response too.
+Responses carry the ``id`` of their request, and may come out of order.
+
+- ``{"id": 1, "op": "load", "maze": "a", "array": [[0, 1], [-1, 2]]}``
+  loads (or replaces) a maze
+- ``{"id": 2, "op": "update", "maze": "a", "cells": [[0, 0, -1]]}``
+  changes cells given as ``[row, column, kind]``, kinds are -2 to 6 as
+  in the editor
+- ``{"id": 3, "op": "path", "maze": "a", "cell": [1, 1]}``
+  asks for a path, answered with ``{"id": 3, "path": [[1, 1], ...]}``;
+  with ``"format": "runs"`` the path is run-length encoded instead, as
+  ``{"id": 3, "runs": [["v", 2], [">", 1]]}``
+- ``{"id": 4, "op": "drop", "maze": "a"}`` unloads a maze
+
+Errors are answered with ``{"id": ..., "error": "message"}``.
+
+Path queries that arrive while the event loop is busy are batched,
+and each batch is answered by a single call to the solver per format.
+Loads and updates are solved in an executor, so queries are answered
+from the previous analysis until the new one is ready.
+"""
+import argparse
+import asyncio
+import json
+
+import numpy
+
+from . import solver
+
+MAZE_T = numpy.int8
+# Kinds of tiles, from unbreakable walls to dudes
+KINDS = range(-2, 7)
+HOST = '127.0.0.1'
+PORT = 8765
+# Longest line of a request or response, in bytes; whole mazes are sent
+# as one line, and asyncio's default of 64 KiB fits only tiny ones
+LINE_LIMIT = 64 * 2**20
+
+
+def _index(value):
+    # bool is an int too, but it's not a valid coordinate
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise TypeError('Coordinates must be integers, not {!r}'.format(value))
+    return value
+
+
+def _kind(value):
+    if _index(value) not in KINDS:
+        raise ValueError('Unknown kind of tile {!r}'.format(value))
+    return value
+
+
+def _location(location, shape=None):
+    """Check that location is [row, column] (within shape), return a tuple"""
+    try:
+        row, column = location
+    except (TypeError, ValueError):
+        raise ValueError('Cell must be [row, column], not {!r}'.format(
+            location)) from None
+    row, column = _index(row), _index(column)
+    if shape is not None and not (0 <= row < shape[0] and
+                                  0 <= column < shape[1]):
+        raise IndexError('Cell {!r} is out of the maze'.format(location))
+    return row, column
+
+
+class MazeServer:
+    def __init__(self, *, executor=None):
+        self.executor = executor
+        self.mazes = {}
+        # maze name -> list of (location, runs, future) waiting for the next
+        # batch
+        self._pending = {}
+        # maze name -> lock serializing loads and updates
+        self._locks = {}
+
+    async def load(self, name, array):
+        array = numpy.array(array)
+        if array.ndim != 2:
+            raise ValueError('Maze must be a 2D array')
+        # check before casting, out of range kinds would wrap around
+        if array.dtype.kind not in 'iu':
+            raise ValueError('Maze must be an array of integers')
+        if array.size and (array.min() < KINDS[0] or
+                           array.max() > KINDS[-1]):
+            raise ValueError('Unknown kinds of tiles in maze')
+        array = array.astype(MAZE_T)
+        async with self._lock(name):
+            await self._solve(name, array)
+        return self.mazes[name]
+
+    async def update(self, name, cells):
+        async with self._lock(name):
+            array, _ = self._get(name)
+            # the current array is still used to answer queries
+            array = array.copy()
+            cells = [(_location(cell[:2], array.shape), _kind(cell[2]))
+                     for cell in cells]
+            for location, kind in cells:
+                array[location] = kind
+            await self._solve(name, array)
+        return self.mazes[name]
+
+    def drop(self, name):
+        self._get(name)
+        del self.mazes[name]
+
+    def query(self, name, location, *, runs=False):
+        """Return a future with path from location, or None if there's none
+
+        With runs, the path is run-length encoded, see solver.arrows_to_runs.
+
+        Queries are collected and answered in one batch once the event loop
+        gets to it.
+        """
+        self._get(name)
+        location = _location(location)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(name, [])
+        if not pending:
+            loop.call_soon(self._flush, name)
+        pending.append((location, runs, future))
+        return future
+
+    def _flush(self, name):
+        batch = self._pending.pop(name, [])
+        if name not in self.mazes:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(KeyError(name))
+            return
+        _, amaze = self.mazes[name]
+        try:
+            paths = iter(amaze.paths(location for location, runs, _ in batch
+                                     if not runs))
+            runs = iter(amaze.runs_many(location for location, runs, _ in batch
+                                        if runs))
+            results = [next(runs) if encoded else next(paths)
+                       for _, encoded, _ in batch]
+        except Exception as e:
+            # nobody else would ever resolve the futures
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (*_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _solve(self, name, array):
+        loop = asyncio.get_running_loop()
+        amaze = await loop.run_in_executor(self.executor,
+                                           solver.analyze, array)
+        self.mazes[name] = array, amaze
+
+    def _get(self, name):
+        try:
+            return self.mazes[name]
+        except KeyError:
+            raise KeyError('No maze named {!r}'.format(name)) from None
+
+    def _lock(self, name):
+        return self._locks.setdefault(name, asyncio.Lock())
+
+    async def handle_request(self, request):
+        op = request.get('op')
+        name = request.get('maze')
+        if op == 'path':
+            runs = request.get('format', 'path') == 'runs'
+            path = await self.query(name, request['cell'], runs=runs)
+            if path is None:
+                raise ValueError('No path from {}'.format(request['cell']))
+            if runs:
+                return {'runs': [(symb.decode(), count)
+                                 for symb, count in path]}
+            return {'path': path}
+        if op == 'load':
+            _, amaze = await self.load(name, request['array'])
+            return {'reachable': amaze.is_reachable}
+        if op == 'update':
+            _, amaze = await self.update(name, request['cells'])
+            return {'reachable': amaze.is_reachable}
+        if op == 'drop':
+            self.drop(name)
+            return {}
+        raise ValueError('Unknown op {!r}'.format(op))
+
+    async def _respond(self, request, writer):
+        try:
+            response = await self.handle_request(request)
+        except Exception as e:
+            response = {'error': str(e)}
+        response['id'] = request.get('id')
+        writer.write(json.dumps(response).encode() + b'\n')
+
+    async def handle_client(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError as e:
+                    # too long, the rest of the stream can't be trusted
+                    writer.write(json.dumps({'error': str(e)}).encode() + b'\n')
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('Request must be a JSON object')
+                except ValueError as e:
+                    writer.write(json.dumps({'error': str(e)}).encode() + b'\n')
+                    continue
+                # handle requests concurrently, so they can be batched
+                task = asyncio.ensure_future(self._respond(request, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                await writer.drain()
+            if tasks:
+                await asyncio.wait(tasks)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def start(self, *, host=HOST, port=PORT, path=None,
+                    limit=LINE_LIMIT):
+        """Start listening on Unix socket path, or on TCP host and port
+
+        Requests longer than limit bytes are answered with an error, and
+        their connection is closed.
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle_client, path,
+                                                   limit=limit)
+        return await asyncio.start_server(self.handle_client, host, port,
+                                          limit=limit)
+
+
+async def serve(*, host=HOST, port=PORT, path=None, mazes=()):
+    server = MazeServer()
+    for filename in mazes:
+        await server.load(filename, numpy.loadtxt(filename, dtype=MAZE_T))
+    listener = await server.start(host=host, port=port, path=path)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve maze path queries')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--unix', metavar='PATH',
+                        help='listen on a Unix socket instead of TCP')
+    parser.add_argument('mazes', nargs='*', metavar='FILE',
+                        help='NumPy files to load, named by their filename')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(host=args.host, port=args.port, path=args.unix,
+                          mazes=args.mazes))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#cython: language_level=3, boundscheck=False, wraparound=False, initializedcheck=False, cdivision=True
+"""
+Many agents walking along the directions array to the castles.
+"""
+import numpy
+cimport numpy
+
+
+cdef char TARGET = ord('X')
+cdef char LEFT = ord('<')
+cdef char RIGHT = ord('>')
+cdef char UP = ord('^')
+cdef char DOWN = ord('v')
+
+
+def step(numpy.ndarray[numpy.int8_t, ndim=2] directions,
+         numpy.ndarray[numpy.int_t, ndim=2] positions,
+         numpy.ndarray[numpy.uint8_t, ndim=1] arrived,
+         numpy.ndarray[numpy.int_t, ndim=1] arrivals,
+         int steps=1):
+    """Move all the agents up to steps cells along the directions, in place
+
+    Agents that are on a castle don't move, neither do those on walls or
+    on unreachable cells.
+
+    Args:
+        directions: The directions array, as returned by solver.flood
+        positions: (n, 2) array with row and column of every agent
+        arrived: Flags of agents that are on a castle, updated in place
+        arrivals: Array of at least n items to store indices of agents that
+            arrived during this call in
+
+    Returns:
+        int: The number of agents that arrived, their indices are at the
+        start of arrivals
+    """
+    cdef Py_ssize_t n = positions.shape[0], i, r, c, rows, columns
+    cdef Py_ssize_t count = 0
+    cdef int s
+    cdef char symb
+    rows, columns = directions.shape[0], directions.shape[1]
+    if arrived.shape[0] < n or arrivals.shape[0] < n:
+        raise ValueError('Output arrays are too small')
+    for i in range(n):
+        if arrived[i]:
+            continue
+        r, c = positions[i, 0], positions[i, 1]
+        if not (0 <= r < rows and 0 <= c < columns):
+            raise IndexError('Agent {} is out of the maze'.format(i))
+        for s in range(steps):
+            symb = directions[r, c]
+            if symb == UP:
+                r -= 1
+            elif symb == DOWN:
+                r += 1
+            elif symb == LEFT:
+                c -= 1
+            elif symb == RIGHT:
+                c += 1
+            else:
+                # castle, wall or unreachable
+                break
+        positions[i, 0], positions[i, 1] = r, c
+        if directions[r, c] == TARGET:
+            arrived[i] = 1
+            arrivals[count] = i
+            count += 1
+    return count
+
+
+class Swarm:
+    """Agents walking along the directions array to the castles
+
+    Positions are kept as (n, 2) array of rows and columns, and moved in
+    place. Agents on walls or on unreachable cells never move.
+    """
+    def __init__(self, directions, positions):
+        self.directions = directions
+        self.positions = numpy.array(positions, dtype=numpy.int).reshape(-1, 2)
+        if len(self.positions) and (
+                (self.positions < 0).any() or
+                (self.positions >= directions.shape).any()):
+            raise ValueError('All agents must be in the maze')
+        self.arrived = numpy.zeros(len(self.positions), dtype=numpy.bool_)
+        self._arrivals = numpy.empty(len(self.positions), dtype=numpy.int)
+        self.arrived[:] = self._at(b'X')
+
+    def _at(self, symbol):
+        r, c = self.positions.T
+        return self.directions[r, c] == symbol
+
+    def step(self, steps=1):
+        """Move all the agents up to steps cells
+
+        Returns an array of indices of agents that arrived at a castle.
+        """
+        count = step(self.directions, self.positions,
+                     self.arrived.view(numpy.uint8), self._arrivals, steps)
+        return self._arrivals[:count].copy()
+
+    @property
+    def stuck(self):
+        """Flags of agents that will never arrive"""
+        return self._at(b'#') | self._at(b' ')
+
+    @property
+    def done(self):
+        """True if no agent can move any more"""
+        return bool((self.arrived | self.stuck).all())
@@ -10,36 +10,76 @@ cdef struct coords:
     int c
 
 
-cdef coords up(coords shape, coords loc):
+cdef inline coords at(int r, int c) nogil:
+    # coords(r, c) would go through a dict, which needs the GIL
+    cdef coords loc
+    loc.r, loc.c = r, c
+    return loc
+
+
+cdef coords up(coords shape, coords loc) nogil:
     if loc.r == 0:
-        return coords(-1, -1)
-    return coords(loc.r - 1, loc.c)
+        return at(-1, -1)
+    return at(loc.r - 1, loc.c)
 
 
-cdef coords down(coords shape, coords loc):
+cdef coords down(coords shape, coords loc) nogil:
     if loc.r == shape.r - 1:
-        return coords(-1, -1)
-    return coords(loc.r + 1, loc.c)
+        return at(-1, -1)
+    return at(loc.r + 1, loc.c)
 
 
-cdef coords left(coords shape, coords loc):
+cdef coords left(coords shape, coords loc) nogil:
     if loc.c == 0:
-        return coords(-1, -1)
-    return coords(loc.r, loc.c - 1)
+        return at(-1, -1)
+    return at(loc.r, loc.c - 1)
 
 
-cdef coords right(coords shape, coords loc):
+cdef coords right(coords shape, coords loc) nogil:
     if loc.c == shape.c - 1:
-        return coords(-1, -1)
-    return coords(loc.r, loc.c + 1)
+        return at(-1, -1)
+    return at(loc.r, loc.c + 1)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.initializedcheck(False)
+cdef find(numpy.int8_t[:, :] maze, int lo, int hi):
+    """Return coordinates of cells with lo <= kind <= hi, as (n, 2) array
+
+    Unlike numpy.where, this doesn't allocate a mask of the whole maze.
+    """
+    cdef Py_ssize_t r, c, n = 0
+    with nogil:
+        for r in range(maze.shape[0]):
+            for c in range(maze.shape[1]):
+                if lo <= maze[r, c] <= hi:
+                    n += 1
+    found = numpy.empty((n, 2), dtype=numpy.int)
+    cdef numpy.int_t[:, :] out = found
+    n = 0
+    with nogil:
+        for r in range(maze.shape[0]):
+            for c in range(maze.shape[1]):
+                if lo <= maze[r, c] <= hi:
+                    out[n, 0] = r
+                    out[n, 1] = c
+                    n += 1
+    return found
 
 
 def ends(maze):
-    return numpy.asarray(numpy.where(maze == 1)).T
+    maze = numpy.asarray(maze)
+    if maze.dtype != numpy.int8:
+        return numpy.asarray(numpy.where(maze == 1)).T
+    return find(maze, 1, 1)
 
 
 def starts(maze):
-    return numpy.asarray(numpy.where(maze >= 2)).T
+    maze = numpy.asarray(maze)
+    if maze.dtype != numpy.int8:
+        return numpy.asarray(numpy.where(maze >= 2)).T
+    return find(maze, 2, 127)
 
 
 cdef char TARGET = ord('X')
@@ -54,20 +94,12 @@ cdef char SPACE = ord(' ')
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.initializedcheck(False)
-def arrows_to_path(numpy.ndarray[numpy.int8_t, ndim=2] arrows, int column, int row):
-    cdef coords loc = coords(column, row)
-    cdef coords shape
-    shape.r, shape.c = arrows.shape[0], arrows.shape[1]
-
-    if arrows[loc.r, loc.c] == WALL:
-        raise ValueError('Cannot construct path for wall')
-    if arrows[loc.r, loc.c] == SPACE:
-        raise ValueError('Cannot construct path for unreachable cell')
+cdef size_t walk(numpy.ndarray[numpy.int8_t, ndim=2] arrows, coords shape,
+                 coords loc, coords * path):
+    """Follow the arrows from loc to the target, storing cells in path
 
-    # the path can never be longer than number of cells
-    cdef coords * path = <coords *>PyMem_Malloc(shape.r*shape.c*sizeof(coords))
-    if path == NULL:
-        raise MemoryError()
+    Returns the number of cells stored
+    """
     path[0] = loc
     cdef size_t s = 1
     cdef char symb
@@ -84,6 +116,27 @@ def arrows_to_path(numpy.ndarray[numpy.int8_t, ndim=2] arrows, int column, int r
             nloc = down(shape, nloc)
         path[s] = nloc
         s += 1
+    return s
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.initializedcheck(False)
+def arrows_to_path(numpy.ndarray[numpy.int8_t, ndim=2] arrows, int column, int row):
+    cdef coords loc = coords(column, row)
+    cdef coords shape
+    shape.r, shape.c = arrows.shape[0], arrows.shape[1]
+
+    if arrows[loc.r, loc.c] == WALL:
+        raise ValueError('Cannot construct path for wall')
+    if arrows[loc.r, loc.c] == SPACE:
+        raise ValueError('Cannot construct path for unreachable cell')
+
+    # the path can never be longer than number of cells
+    cdef coords * path = <coords *>PyMem_Malloc(shape.r*shape.c*sizeof(coords))
+    if path == NULL:
+        raise MemoryError()
+    cdef size_t s = walk(arrows, shape, loc, path)
 
     lpath = []
     cdef size_t i
@@ -94,12 +147,181 @@ def arrows_to_path(numpy.ndarray[numpy.int8_t, ndim=2] arrows, int column, int r
     return lpath
 
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.initializedcheck(False)
+def arrows_to_paths(numpy.ndarray[numpy.int8_t, ndim=2] arrows, locations):
+    """Construct paths for many locations at once
+
+    The scratch buffer is shared by all the locations, so this is cheaper
+    than calling arrows_to_path in a loop.
+
+    Args:
+        arrows: The directions array
+        locations: An iterable with (row, column) pairs
+
+    Returns:
+        list: A path for each location, or None for walls and unreachable
+        cells
+    """
+    cdef coords shape
+    shape.r, shape.c = arrows.shape[0], arrows.shape[1]
+    cdef coords loc
+    cdef char symb
+
+    cdef coords * path = <coords *>PyMem_Malloc(shape.r*shape.c*sizeof(coords))
+    if path == NULL:
+        raise MemoryError()
+    cdef size_t s, i
+    paths = []
+    try:
+        for location in locations:
+            loc.r, loc.c = location
+            if not (0 <= loc.r < shape.r and 0 <= loc.c < shape.c):
+                paths.append(None)
+                continue
+            symb = arrows[loc.r, loc.c]
+            if symb == WALL or symb == SPACE:
+                paths.append(None)
+                continue
+            s = walk(arrows, shape, loc, path)
+            lpath = []
+            for i in range(s):
+                lpath.append((path[i].r, path[i].c))
+            paths.append(lpath)
+    finally:
+        PyMem_Free(path)
+    return paths
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.initializedcheck(False)
+cdef list walk_runs(numpy.ndarray[numpy.int8_t, ndim=2] arrows,
+                    coords shape, coords loc):
+    runs = []
+    cdef char symb, last = 0
+    cdef size_t count = 0
+    while arrows[loc.r, loc.c] != TARGET:
+        symb = arrows[loc.r, loc.c]
+        if symb != last:
+            if count:
+                runs.append((bytes((last,)), count))
+            last = symb
+            count = 0
+        count += 1
+        if symb == UP:
+            loc = up(shape, loc)
+        elif symb == LEFT:
+            loc = left(shape, loc)
+        elif symb == RIGHT:
+            loc = right(shape, loc)
+        else:
+            loc = down(shape, loc)
+    if count:
+        runs.append((bytes((last,)), count))
+    return runs
+
+
+def arrows_to_runs(numpy.ndarray[numpy.int8_t, ndim=2] arrows, int column, int row):
+    """Construct a run-length encoded path
+
+    Returns:
+        list: (direction, count) tuples, direction being one of the
+        arrow symbols (b'^', b'v', b'<', b'>'), count the number of steps
+        in that direction
+    """
+    cdef coords loc = coords(column, row)
+    cdef coords shape
+    shape.r, shape.c = arrows.shape[0], arrows.shape[1]
+
+    if not (0 <= loc.r < shape.r and 0 <= loc.c < shape.c):
+        raise IndexError('Location is out of the maze')
+    if arrows[loc.r, loc.c] == WALL:
+        raise ValueError('Cannot construct path for wall')
+    if arrows[loc.r, loc.c] == SPACE:
+        raise ValueError('Cannot construct path for unreachable cell')
+
+    return walk_runs(arrows, shape, loc)
+
+
+def arrows_to_runs_many(numpy.ndarray[numpy.int8_t, ndim=2] arrows, locations):
+    """Construct run-length encoded paths for many locations at once
+
+    Like arrows_to_paths, but with paths encoded as by arrows_to_runs.
+
+    Args:
+        arrows: The directions array
+        locations: An iterable with (row, column) pairs
+
+    Returns:
+        list: Runs for each location, or None for walls, unreachable cells
+        and locations out of the maze
+    """
+    cdef coords shape
+    shape.r, shape.c = arrows.shape[0], arrows.shape[1]
+    cdef coords loc
+    cdef char symb
+    runs = []
+    for location in locations:
+        loc.r, loc.c = location
+        if not (0 <= loc.r < shape.r and 0 <= loc.c < shape.c):
+            runs.append(None)
+            continue
+        symb = arrows[loc.r, loc.c]
+        if symb == WALL or symb == SPACE:
+            runs.append(None)
+        else:
+            runs.append(walk_runs(arrows, shape, loc))
+    return runs
+
+
+STEPS = {
+    b'^': (-1, 0),
+    b'v': (1, 0),
+    b'<': (0, -1),
+    b'>': (0, 1),
+}
+
+
+def iter_runs(runs, row, column):
+    """Yield the cells of a run-length encoded path starting at (row, column)
+    """
+    yield row, column
+    for symb, count in runs:
+        dr, dc = STEPS[symb]
+        for i in range(count):
+            row += dr
+            column += dc
+            yield row, column
+
+
+def runs_to_path(runs, row, column):
+    """Decode a run-length encoded path to a list of cells, like arrows_to_path
+    """
+    return list(iter_runs(runs, row, column))
+
+
+def runs_length(runs):
+    """Return the number of steps in a run-length encoded path
+
+    That is the distance to the target, one less than the number of cells.
+    """
+    return sum(count for _, count in runs)
+
+
 cdef struct job:
     coords loc
     int dist
     char symb
 
 
+cdef inline job make_job(coords loc, int dist, char symb) nogil:
+    cdef job ajob
+    ajob.loc, ajob.dist, ajob.symb = loc, dist, symb
+    return ajob
+
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.initializedcheck(False)
@@ -119,100 +341,432 @@ cdef class JobQueue:
         if self.jobs != NULL:
             PyMem_Free(self.jobs)
 
-    cdef void put(self, job ajob):
+    cdef reserve(self, int size):
+        """Empty the queue, make sure it can hold size jobs"""
+        cdef job * jobs
+        if size > self.size:
+            jobs = <job *>PyMem_Realloc(self.jobs, size*sizeof(job))
+            if jobs == NULL:
+                raise MemoryError()
+            self.jobs = jobs
+            self.size = size
+        self.top = 0
+        self.bottom = 0
+
+    cdef void put(self, job ajob) nogil:
         self.jobs[self.top % self.size] = ajob
         self.top += 1
 
-    cdef job get(self):
+    cdef int push(self, job ajob) except -1:
+        """Like put, but grows the queue when it's full"""
+        cdef job * jobs
+        cdef int i, n = self.top - self.bottom
+        if n >= self.size:
+            jobs = <job *>PyMem_Malloc(max(2*self.size, 16)*sizeof(job))
+            if jobs == NULL:
+                raise MemoryError()
+            for i in range(n):
+                jobs[i] = self.jobs[(self.bottom + i) % self.size]
+            PyMem_Free(self.jobs)
+            self.jobs = jobs
+            self.size = max(2*self.size, 16)
+            self.bottom = 0
+            self.top = n
+        self.put(ajob)
+        return 0
+
+    cdef job get(self) nogil:
         self.bottom += 1
         return self.jobs[(self.bottom-1) % self.size]
 
-    cdef bint empty(self):
+    cdef bint empty(self) nogil:
         return self.bottom == self.top
 
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.initializedcheck(False)
-def flood(numpy.ndarray[numpy.int8_t, ndim=2] maze):
+def flood(numpy.ndarray[numpy.int8_t, ndim=2] maze, *,
+          bint stop_at_starts=False, int max_radius=-1,
+          numpy.ndarray[numpy.int_t, ndim=2] distances=None,
+          numpy.ndarray[numpy.int8_t, ndim=2] directions=None,
+          JobQueue jobs=None):
+    """Flood the maze from all the castles
+
+    Args:
+        maze: The maze
+        stop_at_starts: Stop as soon as all the starts (dudes) are reached,
+            leaving the rest of the maze unreached
+        max_radius: If not negative, don't go further than this distance
+            from the castles
+        distances: Array to store the distances in (new is created if omitted)
+        directions: Array to store the directions in (new is created if
+            omitted)
+        jobs: JobQueue to reuse (new is created if omitted)
+
+    Returns:
+        tuple: The distances and directions arrays, unreached cells are
+        -1 and space respectively
+    """
     cdef coords shape = coords(maze.shape[0], maze.shape[1])
-    cdef numpy.ndarray[numpy.int_t, ndim=2] distances = numpy.full((shape.r, shape.c), -1, dtype=numpy.int)
-
+    if distances is None:
+        distances = numpy.empty((shape.r, shape.c), dtype=numpy.int)
     # int8_t is the same type as ('a', 1), but we'll need to work with ords
-    # Initialize everything as walls
-    # Cannot use WALL here, Python is handling this, not C
-    cdef numpy.ndarray[numpy.int8_t, ndim=2]  directions = numpy.full((shape.r, shape.c), b'#', dtype=('a', 1))
-    # Add spaces where there are no walls
-    # Cannot use SPACE here, dtto
-    directions[maze >= 0] = b' '
+    if directions is None:
+        directions = numpy.empty((shape.r, shape.c), dtype=('a', 1))
+    if (distances.shape[0], distances.shape[1]) != (shape.r, shape.c) or \
+            (directions.shape[0], directions.shape[1]) != (shape.r, shape.c):
+        raise ValueError('Output arrays must have the same shape as the maze')
+
+    # The loops don't touch Python objects, so other threads may run
+    cdef numpy.int8_t[:, :] cells = maze
+    cdef numpy.int_t[:, :] dists = distances
+    cdef numpy.int8_t[:, :] arrows = directions
+
+    # Walls where there are walls, spaces elsewhere
+    cdef Py_ssize_t r, c, n_ends = 0, starts_left = 0
+    cdef numpy.int8_t kind
+    with nogil:
+        for r in range(shape.r):
+            for c in range(shape.c):
+                kind = cells[r, c]
+                dists[r, c] = -1
+                if kind < 0:
+                    arrows[r, c] = WALL
+                else:
+                    arrows[r, c] = SPACE
+                    if kind == 1:
+                        n_ends += 1
+                    elif kind >= 2:
+                        starts_left += 1
 
     # TODO allocate what we actually need, this is a guess
-    ends_ = ends(maze)
-    cdef JobQueue jobs = JobQueue(shape.r*shape.c*min(len(ends_), 4))
-
-    for end in ends_:
-        jobs.put(job(coords(end[0], end[1]), 0, TARGET))
+    cdef int size = shape.r*shape.c*min(n_ends, 4)
+    if jobs is None:
+        jobs = JobQueue(size)
+    else:
+        jobs.reserve(size)
 
     cdef coords loc, nloc
     cdef size_t i
     cdef int dist
     cdef char symb
     cdef job ajob
+    with nogil:
+        if n_ends:
+            for r in range(shape.r):
+                for c in range(shape.c):
+                    if cells[r, c] == 1:
+                        jobs.put(make_job(at(r, c), 0, TARGET))
+
+        while not jobs.empty():
+            # Jobs come in order of distance, so once a start is reached,
+            # its distance is final
+            if stop_at_starts and starts_left == 0:
+                break
+            ajob = jobs.get()
+            loc = ajob.loc
+            dist = ajob.dist
+            symb = ajob.symb
+            # It's a wall or we've been there better
+            if arrows[loc.r, loc.c] == WALL or 0 <= dists[loc.r, loc.c] <= dist:
+                continue
+            arrows[loc.r, loc.c] = symb
+            dists[loc.r, loc.c] = dist
+            if stop_at_starts and cells[loc.r, loc.c] >= 2:
+                starts_left -= 1
+            if dist == max_radius:
+                continue
+
+            nloc = down(shape, loc)
+            if nloc.r != -1:
+                jobs.put(make_job(nloc, dist+1, UP))
+
+            nloc = up(shape, loc)
+            if nloc.r != -1:
+                jobs.put(make_job(nloc, dist+1, DOWN))
+
+            nloc = left(shape, loc)
+            if nloc.r != -1:
+                jobs.put(make_job(nloc, dist+1, RIGHT))
+
+            nloc = right(shape, loc)
+            if nloc.r != -1:
+                jobs.put(make_job(nloc, dist+1, LEFT))
+
+    return distances, directions
+
+
+cdef inline bint points_to(char symb, coords loc, coords target):
+    """Is the arrow symb at loc pointing to the target?"""
+    if symb == UP:
+        return loc.r - 1 == target.r and loc.c == target.c
+    if symb == DOWN:
+        return loc.r + 1 == target.r and loc.c == target.c
+    if symb == LEFT:
+        return loc.r == target.r and loc.c - 1 == target.c
+    if symb == RIGHT:
+        return loc.r == target.r and loc.c + 1 == target.c
+    return False
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.initializedcheck(False)
+def reflood(numpy.ndarray[numpy.int8_t, ndim=2] maze,
+            numpy.ndarray[numpy.int_t, ndim=2] distances,
+            numpy.ndarray[numpy.int8_t, ndim=2] directions,
+            changed, *, int max_radius=-1):
+    """Update a complete flood after some cells of the maze changed
+
+    Only cells whose way to a castle went through a changed cell are
+    flooded again, and cells that got closer to a castle are updated.
+    Where there are more shortest ways, the one picked may differ from what
+    flood would pick.
+
+    Args:
+        maze: The maze, already changed
+        distances: Distances from flood of the maze before the change,
+            updated in place
+        directions: Directions from flood of the maze before the change,
+            updated in place
+        changed: An iterable with (row, column) pairs of changed cells
+        max_radius: The max_radius given to flood
+
+    Returns:
+        tuple: The distances and directions arrays
+
+    Raises:
+        IndexError: If a changed cell is out of the maze, nothing is
+            updated then
+    """
+    cdef coords shape = coords(maze.shape[0], maze.shape[1])
+    cdef coords loc, nloc
+    cdef coords[4] nlocs
+    cdef char[4] back
+    cdef int k, dist
+    cdef char symb
+    cdef job ajob
+    cdef bint was_open, was_castle
+
+    changed = list(changed)
+    for location in changed:
+        loc.r, loc.c = location
+        if not (0 <= loc.r < shape.r and 0 <= loc.c < shape.c):
+            raise IndexError('Location is out of the maze')
+
+    # Cells that have to be flooded again: changed walls and castles, and
+    # everything that led to them. Dudes don't matter for the flood.
+    cdef JobQueue invalid = JobQueue(16)
+    for location in changed:
+        loc.r, loc.c = location
+        symb = directions[loc.r, loc.c]
+        was_open = symb != WALL
+        was_castle = symb == TARGET
+        if was_open == (maze[loc.r, loc.c] >= 0) and \
+                was_castle == (maze[loc.r, loc.c] == 1):
+            continue
+        invalid.push(job(loc, -1, 0))
+        directions[loc.r, loc.c] = SPACE
+        distances[loc.r, loc.c] = -1
+
+    cdef int i = 0
+    while i < invalid.top - invalid.bottom:
+        loc = invalid.jobs[(invalid.bottom + i) % invalid.size].loc
+        i += 1
+        nlocs[0], nlocs[1] = up(shape, loc), down(shape, loc)
+        nlocs[2], nlocs[3] = left(shape, loc), right(shape, loc)
+        for k in range(4):
+            nloc = nlocs[k]
+            if nloc.r == -1:
+                continue
+            if points_to(directions[nloc.r, nloc.c], nloc, loc):
+                invalid.push(job(nloc, -1, 0))
+                directions[nloc.r, nloc.c] = SPACE
+                distances[nloc.r, nloc.c] = -1
+
+    # Seed the invalid cells from castles and their valid neighbours
+    cdef JobQueue jobs = JobQueue(16)
+    for i in range(invalid.top - invalid.bottom):
+        loc = invalid.jobs[(invalid.bottom + i) % invalid.size].loc
+        if maze[loc.r, loc.c] < 0:
+            directions[loc.r, loc.c] = WALL
+            continue
+        if maze[loc.r, loc.c] == 1:
+            jobs.push(job(loc, 0, TARGET))
+            continue
+        nlocs[0], nlocs[1] = up(shape, loc), down(shape, loc)
+        nlocs[2], nlocs[3] = left(shape, loc), right(shape, loc)
+        back[0], back[1], back[2], back[3] = UP, DOWN, LEFT, RIGHT
+        for k in range(4):
+            nloc = nlocs[k]
+            if nloc.r == -1 or distances[nloc.r, nloc.c] < 0:
+                continue
+            dist = distances[nloc.r, nloc.c] + 1
+            if max_radius < 0 or dist <= max_radius:
+                jobs.push(job(loc, dist, back[k]))
+
+    # Flood from the seeds; unlike in flood, jobs don't come in order of
+    # distance, so a cell may be improved more times
     while not jobs.empty():
         ajob = jobs.get()
         loc = ajob.loc
         dist = ajob.dist
-        symb = ajob.symb
-        # It's a wall or we've been there better
         if directions[loc.r, loc.c] == WALL or 0 <= distances[loc.r, loc.c] <= dist:
             continue
-        directions[loc.r, loc.c] = symb
+        directions[loc.r, loc.c] = ajob.symb
         distances[loc.r, loc.c] = dist
+        if dist == max_radius:
+            continue
 
         nloc = down(shape, loc)
         if nloc.r != -1:
-            jobs.put(job(nloc, dist+1, UP))
+            jobs.push(job(nloc, dist+1, UP))
 
         nloc = up(shape, loc)
         if nloc.r != -1:
-            jobs.put(job(nloc, dist+1, DOWN))
+            jobs.push(job(nloc, dist+1, DOWN))
 
         nloc = left(shape, loc)
         if nloc.r != -1:
-            jobs.put(job(nloc, dist+1, RIGHT))
+            jobs.push(job(nloc, dist+1, RIGHT))
 
         nloc = right(shape, loc)
         if nloc.r != -1:
-            jobs.put(job(nloc, dist+1, LEFT))
+            jobs.push(job(nloc, dist+1, LEFT))
 
     return distances, directions
 
 
 def create_lines(arrows, locations):
-    ret = []
-    for loc in locations:
-        loc = tuple(loc)
-        try:
-            ret.append(arrows_to_path(arrows, *loc))
-        except ValueError:
-            # unreachable
-            pass
-    return ret
+    # unreachable locations have no line
+    return [p for p in arrows_to_paths(arrows, locations) if p is not None]
 
 
 def is_reachable(arrows):
-    return b' ' not in arrows
+    # comparing bytes is slow and holds the GIL, compare the ords instead
+    return not (numpy.asarray(arrows).view(numpy.int8) == SPACE).any()
 
 
 class AnalyzedMaze:
-    def __init__(self, maze):
-        self.distances, self.directions = flood(maze)
-        self.lines = create_lines(self.directions, starts(maze))
-        self.is_reachable = is_reachable(self.directions)
+    """Result of the maze analysis
+
+    Unless lazy is true, everything is computed right away.
+    Lazy analysis computes the attributes on first access. If lines are
+    needed before distances or directions, the flood stops as soon as all
+    the dudes are reached, which skips most of a big maze when the dudes are
+    close to castles. The maze must not be modified while a lazy analysis
+    is in use.
+
+    With max_radius, cells further than that from any castle are treated as
+    unreachable.
+
+    If analyzer is given, its buffers are used for distances and directions.
+    """
+    def __init__(self, maze, *, lazy=False, max_radius=None, analyzer=None):
+        self.maze = maze
+        self.max_radius = -1 if max_radius is None else max_radius
+        self._flooder = flood if analyzer is None else analyzer.flood
+        self._flooded = None
+        self._partial = None
+        self._lines = None
+        self._is_reachable = None
+        if not lazy:
+            self._flood()
+            self.lines
+            self.is_reachable
+
+    def _flood(self, partial=False):
+        if self._flooded is not None:
+            return self._flooded
+        if partial:
+            if self._partial is None:
+                self._partial = self._flooder(self.maze, stop_at_starts=True,
+                                              max_radius=self.max_radius)
+            return self._partial
+        self._flooded = self._flooder(self.maze, max_radius=self.max_radius)
+        self._partial = None
+        return self._flooded
+
+    @property
+    def distances(self):
+        return self._flood()[0]
+
+    @property
+    def directions(self):
+        return self._flood()[1]
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            _, directions = self._flood(partial=True)
+            self._lines = create_lines(directions, starts(self.maze))
+        return self._lines
+
+    @property
+    def is_reachable(self):
+        if self._is_reachable is None:
+            self._is_reachable = is_reachable(self.directions)
+        return self._is_reachable
 
     def path(self, column, row):
         return arrows_to_path(self.directions, column, row)
 
-
-def analyze(maze):
-    return AnalyzedMaze(maze)
+    def paths(self, locations):
+        return arrows_to_paths(self.directions, locations)
+
+    def update(self, changed):
+        """Update the analysis after the given cells of the maze changed
+
+        Args:
+            changed: An iterable with (row, column) pairs
+        """
+        if self._flooded is not None:
+            reflood(self.maze, *self._flooded, changed,
+                    max_radius=self.max_radius)
+        self._partial = None
+        self._lines = None
+        self._is_reachable = None
+
+    def runs(self, column, row):
+        return arrows_to_runs(self.directions, column, row)
+
+    def runs_many(self, locations):
+        return arrows_to_runs_many(self.directions, locations)
+
+
+class Analyzer:
+    """Analyzes mazes, reusing the same buffers for all of them
+
+    Buffers are only reallocated when a maze bigger than all the previous
+    ones comes. Distances and directions of an analysis are only valid until
+    the next one is started, copy them if they need to be kept.
+    """
+    def __init__(self, shape=(0, 0)):
+        self._distances = numpy.empty(0, dtype=numpy.int)
+        self._directions = numpy.empty(0, dtype=('a', 1))
+        self._jobs = JobQueue(0)
+        self.reserve(shape)
+
+    def reserve(self, shape):
+        """Make sure mazes of the given shape fit in the buffers"""
+        size = shape[0] * shape[1]
+        if size > len(self._distances):
+            self._distances = numpy.empty(size, dtype=numpy.int)
+            self._directions = numpy.empty(size, dtype=('a', 1))
+
+    def flood(self, maze, **kwargs):
+        self.reserve(maze.shape)
+        size = maze.shape[0] * maze.shape[1]
+        return flood(maze,
+                     distances=self._distances[:size].reshape(maze.shape),
+                     directions=self._directions[:size].reshape(maze.shape),
+                     jobs=self._jobs, **kwargs)
+
+    def analyze(self, maze, *, lazy=False, max_radius=None):
+        return AnalyzedMaze(maze, lazy=lazy, max_radius=max_radius,
+                            analyzer=self)
+
+
+def analyze(maze, *, lazy=False, max_radius=None):
+    return AnalyzedMaze(maze, lazy=lazy, max_radius=max_radius)
@@ -0,0 +1,136 @@
+import numpy
+import pytest
+
+from maze import analyze
+from maze.components import Components
+
+
+def check_same_as_flood(maze, components):
+    amaze = analyze(maze)
+    assert components.is_reachable == amaze.is_reachable
+    connected = (amaze.directions != b' ') & (amaze.directions != b'#')
+    for (row, column), expected in numpy.ndenumerate(connected):
+        assert components.is_connected(row, column) == expected
+    labels = components.labels
+    assert ((labels == -1) == (maze < 0)).all()
+    # cells share a label exactly when they are next to each other
+    expected = label(maze)
+    pairs = set(zip(labels.ravel(), expected.ravel()))
+    assert len(pairs) == len(set(labels.ravel())) == len(set(expected.ravel()))
+
+
+def label(maze):
+    """Label components of open cells with a plain flood fill"""
+    labels = numpy.full(maze.shape, -1)
+    for start in zip(*numpy.nonzero(maze >= 0)):
+        if labels[start] >= 0:
+            continue
+        labels[start] = start[0] * maze.shape[1] + start[1]
+        stack = [start]
+        while stack:
+            r, c = stack.pop()
+            for loc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if (0 <= loc[0] < maze.shape[0] and 0 <= loc[1] < maze.shape[1]
+                        and maze[loc] >= 0 and labels[loc] < 0):
+                    labels[loc] = labels[start]
+                    stack.append(loc)
+    return labels
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_updates_match_flood(seed):
+    rnd = numpy.random.RandomState(seed)
+    maze = rnd.choice([-1, 0, 0, 0], size=(12, 17)).astype(numpy.int8)
+    maze[rnd.randint(12), rnd.randint(17)] = 1
+    components = Components(maze)
+    check_same_as_flood(maze, components)
+    for i in range(40):
+        changed = [(rnd.randint(12), rnd.randint(17))
+                   for j in range(rnd.randint(1, 6))]
+        for loc in changed:
+            maze[loc] = rnd.choice([-2, -1, -1, 0, 0, 1, 2])
+        components.update(changed)
+        check_same_as_flood(maze, components)
+
+
+def test_wall_splits_corridor():
+    maze = numpy.zeros((1, 7), dtype=numpy.int8)
+    maze[0, 0] = 1
+    components = Components(maze)
+    assert components.is_reachable
+    maze[0, 3] = -1
+    components.update([(0, 3)])
+    assert not components.is_reachable
+    assert components.unreached == 3
+    assert components.is_connected(0, 2)
+    assert not components.is_connected(0, 4)
+    assert not components.is_connected(0, 3)
+    maze[0, 6] = 1
+    components.update([(0, 6)])
+    assert components.is_reachable
+    maze[0, 3] = 0
+    maze[0, 6] = 0
+    components.update([(0, 3), (0, 6)])
+    assert components.is_reachable
+    assert len(set(components.labels.ravel())) == 1
+
+
+def test_no_open_cells():
+    maze = numpy.full((3, 3), -1, dtype=numpy.int8)
+    components = Components(maze)
+    assert components.is_reachable
+    with pytest.raises(IndexError):
+        components.is_connected(3, 0)
+
+
+def test_repeated_cells():
+    maze = numpy.array([[1, -1]], dtype=numpy.int8)
+    components = Components(maze)
+    maze[0, 1] = 0
+    components.update([(0, 1), (0, 1)])
+    assert components.unreached == 0
+    maze[0, 1] = -1
+    components.update([(0, 1), (0, 1)])
+    assert components.unreached == 0
+    check_same_as_flood(maze, components)
+
+
+def test_wall_splits_room():
+    maze = numpy.zeros((9, 9), dtype=numpy.int8)
+    maze[0, 0] = 1
+    components = Components(maze)
+    for row in range(9):
+        maze[row, 4] = -1
+        components.update([(row, 4)])
+        check_same_as_flood(maze, components)
+    assert components.unreached == 36
+    # a cell opened with walls all around is a component of its own
+    maze[1:4, 1:4] = -1
+    components.update([(r, c) for r in range(1, 4) for c in range(1, 4)])
+    maze[2, 2] = 0
+    components.update([(2, 2)])
+    assert components.unreached == 37
+    check_same_as_flood(maze, components)
+
+
+def test_many_updates():
+    # more changes than cells, so elements get compacted on the way
+    maze = numpy.zeros((4, 5), dtype=numpy.int8)
+    maze[0, 0] = 1
+    components = Components(maze)
+    for i in range(200):
+        maze[1, i % 5] = -1 if maze[1, i % 5] == 0 else 0
+        components.update([(1, i % 5)])
+        check_same_as_flood(maze, components)
+
+
+@pytest.mark.parametrize('location', ((9000000, 0), (0, -1), (0, 3)))
+def test_update_out_of_bounds(location):
+    maze = numpy.zeros((3, 3), dtype=numpy.int8)
+    maze[0, 0] = 1
+    components = Components(maze)
+    maze[1, 1] = -1
+    with pytest.raises(IndexError):
+        components.update([(1, 1), location])
+    # nothing was updated
+    assert components.labels[1, 1] != -1
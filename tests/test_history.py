@@ -0,0 +1,64 @@
+import numpy
+
+from maze.history import History
+
+
+def stroke(array, history, cells, kind):
+    indices = numpy.ravel_multi_index(numpy.array(cells).T, array.shape)
+    old = array.flat[indices].copy()
+    array.flat[indices] = kind
+    history.record(indices, old, array.flat[indices])
+
+
+def test_undo_redo():
+    array = numpy.zeros((4, 5), dtype=numpy.int8)
+    history = History()
+    assert not history.can_undo
+    assert history.undo(array) is None
+    stroke(array, history, [(0, 0), (1, 1)], -1)
+    stroke(array, history, [(1, 1), (2, 2)], 1)
+    after = array.copy()
+
+    changed = history.undo(array)
+    assert sorted(map(tuple, changed)) == [(1, 1), (2, 2)]
+    assert array[1, 1] == -1 and array[2, 2] == 0
+    history.undo(array)
+    assert not array.any()
+    assert not history.can_undo
+
+    history.redo(array)
+    history.redo(array)
+    assert (array == after).all()
+    assert not history.can_redo
+
+
+def test_record_clears_redo():
+    array = numpy.zeros((3, 3), dtype=numpy.int8)
+    history = History()
+    stroke(array, history, [(0, 0)], -1)
+    history.undo(array)
+    assert history.can_redo
+    stroke(array, history, [(1, 1)], -1)
+    assert not history.can_redo
+    assert history.nbytes == history._undo[0].nbytes
+
+
+def test_limit_evicts_oldest():
+    array = numpy.zeros((10, 10), dtype=numpy.int8)
+    history = History(limit=100)
+    for row in range(10):
+        stroke(array, history, [(row, c) for c in range(2)], -1)
+    assert history.nbytes <= 100
+    count = 0
+    while history.undo(array) is not None:
+        count += 1
+    assert 0 < count < 10
+    # the oldest strokes were forgotten, so they stay
+    assert (array[:10 - count, :2] == -1).all()
+    assert not array[10 - count:].any()
+
+
+def test_empty_change_not_recorded():
+    history = History()
+    history.record([], [], [])
+    assert not history.can_undo
@@ -0,0 +1,275 @@
+import asyncio
+import json
+import time
+
+import numpy
+import pytest
+
+from maze import loadgen
+from maze.server import MazeServer
+
+
+MAZE = [
+    [1, 0, 0],
+    [-1, -1, 0],
+    [2, 0, 0],
+]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def loaded():
+    server = MazeServer()
+    await server.load('m', MAZE)
+    return server
+
+
+def test_query():
+    async def main():
+        server = await loaded()
+        return await server.query('m', (2, 0))
+
+    assert run(main()) == [(2, 0), (2, 1), (2, 2), (1, 2),
+                           (0, 2), (0, 1), (0, 0)]
+
+
+def test_query_runs():
+    async def main():
+        server = await loaded()
+        return await asyncio.gather(server.query('m', (2, 0), runs=True),
+                                    server.query('m', (1, 0), runs=True),
+                                    server.query('m', (0, 1)))
+
+    assert run(main()) == [[(b'>', 2), (b'^', 2), (b'<', 2)], None,
+                           [(0, 1), (0, 0)]]
+
+
+def test_concurrent_queries_are_batched():
+    async def main():
+        server = await loaded()
+        _, amaze = server.mazes['m']
+        calls = []
+        orig = amaze.paths
+
+        def paths(locations):
+            calls.append(1)
+            return orig(locations)
+
+        amaze.paths = paths
+        return calls, await asyncio.gather(server.query('m', (0, 0)),
+                                           server.query('m', (1, 0)),
+                                           server.query('m', (0, 1)))
+
+    calls, paths = run(main())
+    assert len(calls) == 1
+    assert paths == [[(0, 0)], None, [(0, 1), (0, 0)]]
+
+
+def test_concurrent_runs_queries_are_batched():
+    async def main():
+        server = await loaded()
+        _, amaze = server.mazes['m']
+        calls = []
+        orig = amaze.runs_many
+
+        def runs_many(locations):
+            calls.append(1)
+            return orig(locations)
+
+        amaze.runs_many = runs_many
+        return calls, await asyncio.gather(
+            server.query('m', (2, 0), runs=True),
+            server.query('m', (1, 0), runs=True),
+            server.query('m', (0, 1), runs=True),
+            server.query('m', (0, 1)))
+
+    calls, results = run(main())
+    assert len(calls) == 1
+    assert results == [[(b'>', 2), (b'^', 2), (b'<', 2)], None,
+                       [(b'<', 1)], [(0, 1), (0, 0)]]
+
+
+def test_update_resolves():
+    async def main():
+        server = await loaded()
+        before = await server.query('m', (2, 0))
+        await server.update('m', [(1, 0, 0)])
+        after = await server.query('m', (2, 0))
+        return before, after
+
+    before, after = run(main())
+    assert len(before) == 7
+    assert after == [(2, 0), (1, 0), (0, 0)]
+
+
+@pytest.mark.parametrize('cell', ([0, 0, 0], ['a', 'b'], [True, 0], 5))
+def test_malformed_cell_does_not_block_batch(cell):
+    async def main():
+        server = await loaded()
+        return await asyncio.wait_for(asyncio.gather(
+            server.handle_request({'op': 'path', 'maze': 'm',
+                                   'cell': [0, 1]}),
+            server.handle_request({'op': 'path', 'maze': 'm', 'cell': cell}),
+            return_exceptions=True), 1)
+
+    valid, invalid = run(main())
+    assert valid == {'path': [(0, 1), (0, 0)]}
+    assert isinstance(invalid, (TypeError, ValueError))
+
+
+def test_solver_error_reaches_whole_batch():
+    async def main():
+        server = await loaded()
+        _, amaze = server.mazes['m']
+
+        def paths(locations):
+            raise RuntimeError('boom')
+
+        amaze.paths = paths
+        return await asyncio.wait_for(asyncio.gather(
+            server.query('m', (0, 0)), server.query('m', (0, 1)),
+            return_exceptions=True), 1)
+
+    assert [type(e) for e in run(main())] == [RuntimeError, RuntimeError]
+
+
+@pytest.mark.parametrize('cell', ([-1, 0, 0], [0, 3, 0], [0, 'a', 0],
+                                  [0, 0, 1000], [0, 0, -3], [0, 0, 7]))
+def test_update_rejects_bad_cells(cell):
+    async def main():
+        server = await loaded()
+        try:
+            await server.update('m', [cell])
+        finally:
+            # nothing was changed
+            array, _ = server.mazes['m']
+            assert array.tolist() == MAZE
+
+    with pytest.raises((IndexError, TypeError, ValueError)):
+        run(main())
+
+
+@pytest.mark.parametrize('array', ([[0, 1000]], [[0, -3]], [[0, 1.5]],
+                                   [[True]], [0, 1]))
+def test_load_rejects_bad_arrays(array):
+    async def main():
+        server = MazeServer()
+        await server.load('m', array)
+
+    with pytest.raises(ValueError):
+        run(main())
+
+
+@pytest.mark.timeout(60)
+def test_loop_runs_while_solving():
+    # flood releases the GIL, so the loop keeps ticking during big solves
+    array = numpy.zeros((2000, 2000), dtype=numpy.int8)
+    array[0, 0] = 1
+
+    async def main():
+        server = MazeServer()
+        stalls = []
+        solving = True
+
+        async def tick():
+            while solving:
+                start = time.perf_counter()
+                await asyncio.sleep(0.001)
+                stalls.append(time.perf_counter() - start)
+
+        ticker = asyncio.ensure_future(tick())
+        start = time.perf_counter()
+        await server.load('m', array)
+        await server.update('m', [(0, 1, -1)])
+        elapsed = time.perf_counter() - start
+        solving = False
+        await ticker
+        return elapsed, max(stalls)
+
+    elapsed, stall = run(main())
+    assert stall < elapsed / 4
+
+
+def test_unknown_maze():
+    async def main():
+        server = MazeServer()
+        server.query('nope', (0, 0))
+
+    with pytest.raises(KeyError):
+        run(main())
+
+
+def test_protocol(tmp_path):
+    sock = str(tmp_path / 'maze.sock')
+
+    async def main():
+        server = MazeServer()
+        listener = await server.start(path=sock)
+        reader, writer = await asyncio.open_unix_connection(sock)
+        requests = [
+            {'id': 1, 'op': 'load', 'maze': 'm', 'array': MAZE},
+            {'id': 2, 'op': 'path', 'maze': 'm', 'cell': [0, 1]},
+            {'id': 3, 'op': 'path', 'maze': 'm', 'cell': [1, 1]},
+            {'id': 4, 'op': 'bogus'},
+            {'id': 5, 'op': 'path', 'maze': 'm', 'cell': [2, 0],
+             'format': 'runs'},
+        ]
+        responses = {}
+        for request in requests:
+            writer.write(json.dumps(request).encode() + b'\n')
+            response = json.loads(await reader.readline())
+            responses[response['id']] = response
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return responses
+
+    responses = run(main())
+    assert responses[1]['reachable'] is True
+    assert responses[2]['path'] == [[0, 1], [0, 0]]
+    assert 'error' in responses[3]
+    assert 'error' in responses[4]
+    assert responses[5]['runs'] == [['>', 2], ['^', 2], ['<', 2]]
+
+
+def test_long_and_bad_lines(tmp_path):
+    sock = str(tmp_path / 'maze.sock')
+
+    async def main():
+        server = MazeServer()
+        listener = await server.start(path=sock, limit=1024)
+        reader, writer = await asyncio.open_unix_connection(sock)
+        responses = []
+        for line in (b'[1, 2]\n', b'\xff\n', b'[' + b'0, ' * 1024 + b'0]\n'):
+            writer.write(line)
+            responses.append(json.loads(await reader.readline()))
+        # the connection is closed after the line that was too long
+        closed = await reader.readline()
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return responses, closed
+
+    responses, closed = run(main())
+    assert all('error' in response for response in responses)
+    assert closed == b''
+
+
+@pytest.mark.timeout(120)
+def test_loadgen(tmp_path):
+    sock = str(tmp_path / 'maze.sock')
+
+    async def main():
+        listener = await MazeServer().start(path=sock)
+        # the default maze is too big for asyncio's default line limit
+        results = await loadgen.run(path=sock, connections=2, depth=4,
+                                    duration=.2)
+        listener.close()
+        await listener.wait_closed()
+        return results
+
+    results = run(main())
+    assert results['queries'] > 0
+    assert results['errors'] == 0
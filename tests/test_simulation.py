@@ -0,0 +1,69 @@
+import numpy
+import pytest
+
+from maze import analyze
+from maze.simulation import Swarm
+
+
+@pytest.fixture(scope='module')
+def amaze():
+    maze = numpy.zeros((20, 30), dtype=numpy.int8)
+    maze[0, 0] = 1
+    maze[19, 29] = 1
+    maze[10, 5:25] = -1
+    maze[15:, 10] = -1
+    maze[17:, 9] = -1
+    maze[19, 8] = -1
+    return analyze(maze)
+
+
+def all_open(amaze):
+    return numpy.argwhere(amaze.directions != b'#')
+
+
+@pytest.mark.parametrize('steps', (1, 3, 100))
+def test_positions_follow_paths(amaze, steps):
+    positions = all_open(amaze)
+    swarm = Swarm(amaze.directions, positions)
+    arrived = set(numpy.flatnonzero(swarm.arrived))
+    for tick in range(50 // steps + 1):
+        for idx in swarm.step(steps):
+            assert idx not in arrived
+            arrived.add(idx)
+        for start, now in zip(positions, swarm.positions):
+            if amaze.directions[tuple(start)] == b' ':
+                assert tuple(now) == tuple(start)
+                continue
+            path = amaze.path(*start)
+            expected = path[min((tick + 1) * steps, len(path) - 1)]
+            assert tuple(now) == expected
+    assert swarm.done
+    assert set(numpy.flatnonzero(swarm.arrived)) == arrived
+    assert (swarm.arrived | swarm.stuck).all()
+
+
+def test_stuck(amaze):
+    swarm = Swarm(amaze.directions, [(19, 9), (19, 27)])
+    assert list(swarm.stuck) == [True, False]
+    assert not swarm.done
+    assert list(swarm.step(2)) == [1]
+    assert list(swarm.step(2)) == []
+    assert swarm.done
+
+
+def test_out_of_maze(amaze):
+    with pytest.raises(ValueError):
+        Swarm(amaze.directions, [(20, 0)])
+    with pytest.raises(ValueError):
+        Swarm(amaze.directions, [(0, -1)])
+
+
+@pytest.mark.timeout(5)
+def test_million_agents_speed():
+    maze = numpy.zeros((1024, 1024), dtype=numpy.int8)
+    maze[0, 0] = 1
+    amaze = analyze(maze)
+    positions = numpy.random.randint(0, 1024, (1000000, 2))
+    swarm = Swarm(amaze.directions, positions)
+    for i in range(10):
+        swarm.step()
@@ -3,7 +3,9 @@ from itertools import product
 import numpy
 import pytest
 
-from maze import analyze
+from maze import analyze, Analyzer
+from maze.solver import (AnalyzedMaze, ends, flood, iter_runs, runs_length,
+                         runs_to_path, starts)
 
 
 S = (1, 5, 20, 100, 200)
@@ -242,6 +244,238 @@ def test_s_shape_paths(s_shape):
         path = path[1:]
 
 
+def test_walled_paths_batch(walled):
+    maze, amaze, half, d = walled
+    h, w = maze.shape
+    locations = [(r, c) for r in range(h) for c in range(w)]
+    paths = amaze.paths(locations)
+    for loc, path in zip(locations, paths):
+        if amaze.directions[loc] in (b'#', b' '):
+            assert path is None
+        else:
+            assert path == amaze.path(*loc)
+
+
+def test_paths_batch_out_of_bounds():
+    maze = zeros(3, 3)
+    maze[0, 0] = 1
+    amaze = analyze(maze)
+    assert amaze.paths([(3, 0), (0, -1), (1, 0)]) == [None, None,
+                                                      [(1, 0), (0, 0)]]
+
+
+def test_walled_runs_batch(walled):
+    maze, amaze, half, d = walled
+    h, w = maze.shape
+    locations = [(r, c) for r in range(h) for c in range(w)]
+    runs = amaze.runs_many(locations)
+    for loc, encoded in zip(locations, runs):
+        if amaze.directions[loc] in (b'#', b' '):
+            assert encoded is None
+        else:
+            assert encoded == amaze.runs(*loc)
+
+
+def test_runs_batch_out_of_bounds():
+    maze = zeros(3, 3)
+    maze[0, 0] = 1
+    amaze = analyze(maze)
+    assert amaze.runs_many([(3, 0), (0, -1), (2, 0), (0, 0)]) == [
+        None, None, [(b'^', 2)], []]
+
+
+class RecordingAnalyzer:
+    """Analyzer that floods like analyze, but records the floods"""
+    def __init__(self):
+        self.floods = []
+
+    def flood(self, maze, **kwargs):
+        result = flood(maze, **kwargs)
+        self.floods.append((kwargs, result))
+        return result
+
+
+def test_lazy_lines_stop_at_starts():
+    maze = zeros(200, 200)
+    maze[0, 0] = 1
+    maze[1, 2] = 2
+    maze[3, 0] = 3
+    analyzer = RecordingAnalyzer()
+    amaze = AnalyzedMaze(maze, lazy=True, analyzer=analyzer)
+    assert analyzer.floods == []
+
+    assert lt(amaze.lines[1]) == [(3, 0), (2, 0), (1, 0), (0, 0)]
+    assert len(amaze.lines[0]) == 4
+    [(kwargs, (_, directions))] = analyzer.floods
+    assert kwargs['stop_at_starts']
+    # the far corner was never flooded
+    assert directions[199, 199] == b' '
+
+    # a full flood only happens once directions are needed
+    assert amaze.directions[199, 199] in (b'^', b'<')
+    assert len(analyzer.floods) == 2
+    assert not analyzer.floods[1][0].get('stop_at_starts')
+    assert amaze.distances[199, 199] == 398
+    assert amaze.is_reachable
+    assert len(analyzer.floods) == 2
+
+
+def test_lazy_matches_eager(walled):
+    maze, amaze, *_ = walled
+    maze = maze.copy()
+    maze[-1, -1] = 2
+    maze[0, -1] = 2
+    eager = analyze(maze)
+    lazy = analyze(maze, lazy=True)
+    assert lazy.lines == eager.lines
+    assert lazy.is_reachable == eager.is_reachable
+    assert (lazy.directions == eager.directions).all()
+    assert (lazy.distances == eager.distances).all()
+
+
+def test_max_radius():
+    maze = zeros(20, 20)
+    maze[0, 0] = 1
+    maze[19, 19] = 2
+    amaze = analyze(maze, max_radius=5)
+    assert amaze.distances.max() == 5
+    assert amaze.directions[0, 6] == b' '
+    assert amaze.lines == []
+    assert not amaze.is_reachable
+
+
+def test_analyzer_reuses_buffers(walled):
+    maze, amaze, *_ = walled
+    analyzer = Analyzer(maze.shape)
+    results = []
+    for i in range(2):
+        reused = analyzer.analyze(maze)
+        assert (reused.directions == amaze.directions).all()
+        assert (reused.distances == amaze.distances).all()
+        assert reused.is_reachable == amaze.is_reachable
+        results.append(reused)
+    first, second = results
+    assert numpy.shares_memory(first.distances, second.distances)
+    assert numpy.shares_memory(first.directions, second.directions)
+
+
+def test_analyzer_grows():
+    analyzer = Analyzer()
+    small = zeros(3, 3)
+    small[0, 0] = 1
+    big = zeros(10, 10)
+    big[9, 9] = 1
+    assert analyzer.analyze(small).distances.max() == 4
+    grown = analyzer.analyze(big).distances
+    assert grown.max() == 18
+    again = analyzer.analyze(small).distances
+    assert again.max() == 4
+    # the small maze fits in the grown buffers
+    assert numpy.shares_memory(again, grown)
+
+
+@pytest.mark.parametrize('dtype', (numpy.int8, numpy.int64, float))
+def test_starts_ends_dtypes(dtype):
+    maze = numpy.array([[1, 2], [0, 3]], dtype=dtype)
+    assert lt(starts(maze)) == [(0, 1), (1, 1)]
+    assert lt(ends(maze)) == [(0, 0)]
+
+
+def test_flood_out_shape():
+    maze = zeros(3, 3)
+    with pytest.raises(ValueError):
+        flood(maze, distances=numpy.empty((3, 4), dtype=numpy.int))
+
+
+def test_s_shape_runs(s_shape):
+    maze, *_, path, amaze = s_shape
+    h, w = maze.shape
+    runs = amaze.runs(*path[0])
+    assert runs_length(runs) == len(path) - 1
+    assert runs_to_path(runs, *path[0]) == path
+    # a straight run for every column, and one for every step between them
+    assert len(runs) <= 2 * w
+    for symb, count in runs:
+        assert symb in (b'^', b'v', b'>')
+        assert count > 0
+
+
+def test_runs_iter():
+    runs = [(b'v', 2), (b'>', 1), (b'^', 1)]
+    assert list(iter_runs(runs, 0, 0)) == [(0, 0), (1, 0), (2, 0),
+                                           (2, 1), (1, 1)]
+    assert runs_to_path([], 3, 4) == [(3, 4)]
+    assert runs_length(runs) == 4
+
+
+def test_walled_runs_raises(walled):
+    maze, amaze, half, d = walled
+    with pytest.raises(ValueError):
+        amaze.runs(*[half + 1 if d == HORIZONTAL else 0,
+                     half + 1 if d == VERTICAL else 0])
+    with pytest.raises(IndexError):
+        amaze.runs(-1, 0)
+
+
+def check_downhill(amaze):
+    directions = amaze.directions
+    distances = amaze.distances
+    steps = {b'^': (-1, 0), b'v': (1, 0), b'<': (0, -1), b'>': (0, 1)}
+    for (row, column), arrow in numpy.ndenumerate(directions):
+        if arrow in steps:
+            dr, dc = steps[arrow]
+            assert distances[row + dr, column + dc] == \
+                distances[row, column] - 1
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('max_radius', (None, 7))
+def test_update_matches_analyze(seed, max_radius):
+    rnd = numpy.random.RandomState(seed)
+    maze = rnd.choice([-1, 0, 0, 0], size=(15, 20)).astype(numpy.int8)
+    maze[rnd.randint(15), rnd.randint(20)] = 1
+    amaze = analyze(maze, max_radius=max_radius)
+    for i in range(30):
+        changed = [(rnd.randint(15), rnd.randint(20))
+                   for j in range(rnd.randint(1, 4))]
+        for loc in changed:
+            maze[loc] = rnd.choice([-2, -1, 0, 0, 1, 2])
+        amaze.update(changed)
+        fresh = analyze(maze, max_radius=max_radius)
+        assert (amaze.distances == fresh.distances).all()
+        assert ((amaze.directions == b'X') == (fresh.directions == b'X')).all()
+        assert ((amaze.directions == b' ') == (fresh.directions == b' ')).all()
+        assert ((amaze.directions == b'#') == (fresh.directions == b'#')).all()
+        assert amaze.is_reachable == fresh.is_reachable
+        assert [len(l) for l in amaze.lines] == [len(l) for l in fresh.lines]
+        check_downhill(amaze)
+
+
+def test_update_lazy():
+    maze = zeros(5, 5)
+    maze[0, 0] = 1
+    maze[4, 4] = 2
+    amaze = analyze(maze, lazy=True)
+    assert len(amaze.lines[0]) == 9
+    maze[4, 3] = maze[3, 4] = -1
+    amaze.update([(4, 3), (3, 4)])
+    assert amaze.lines == []
+    assert not amaze.is_reachable
+
+
+@pytest.mark.parametrize('location', ((5000000, 5000000), (0, -1), (3, 0)))
+def test_update_out_of_bounds(location):
+    maze = zeros(3, 3)
+    maze[0, 0] = 1
+    amaze = analyze(maze)
+    distances = amaze.distances.copy()
+    directions = amaze.directions.copy()
+    with pytest.raises(IndexError):
+        amaze.update([(1, 1), location])
+    assert (amaze.distances == distances).all()
+    assert (amaze.directions == directions).all()
+
+
 @pytest.fixture(scope='module')
 def huge(request):
     maze = zeros(2048, 2048)
@@ -255,6 +489,13 @@ def test_analyze_speed(huge):
         amaze = analyze(huge)
 
 
+@pytest.mark.timeout(20)
+def test_analyzer_speed(huge):
+    analyzer = Analyzer(huge.shape)
+    for i in range(20):
+        amaze = analyzer.analyze(huge)
+
+
 @pytest.mark.timeout(5)
 def test_path_speed(huge):
     amaze = analyze(huge)